@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import time
+
+from a2a.utils import get_text_parts
+
+import tracing
+from cancellation import budget_metadata
+from my_a2a import send_message, A2A_TIMEOUT_SECONDS
+from green_agentv2 import (
+    grade_without_images, grade_agent_performance, finish_vision_grade, check_rules, deconstruct_task_to_key_points,
+)
+from results_store import ResultsStore
+from evidence import EvidenceSpool
+
+results_store = ResultsStore()
+
+# The White Agent's time budget ends this many seconds before our A2A client times out (or our
+# own deadline), leaving time to send back the evidence gathered so far and grade it.
+DEADLINE_MARGIN_SECONDS = float(os.environ.get("WEBJUDGE_DEADLINE_MARGIN", 15))
+
+# At most this many vision gradings hold decoded images at once per process. A slot is taken
+# before the grading thread starts and given back when that thread finishes.
+MAX_CONCURRENT_GRADING = int(os.environ.get("WEBJUDGE_MAX_CONCURRENT_GRADING", 2))
+vision_slots = asyncio.Semaphore(MAX_CONCURRENT_GRADING)
+
+
+async def run_assessment(
+    white_agent_url: str, task_prompt: str, action_budget: int,
+    traceparent: str | None = None, deadline: float | None = None,
+) -> dict:
+    """
+    Sends the task to the White Agent, grades the returned evidence and records the verdict.
+    Returns the structured result (see format_report for the text rendering).
+    Raises on transport errors so callers can retry.
+    `traceparent` continues a trace started elsewhere (e.g. by the front end that queued the job).
+    `deadline` (epoch seconds) caps how long the White Agent may run.
+    """
+    with tracing.span("assessment", parent=traceparent, white_agent_url=white_agent_url) as root:
+        result = await _run_assessment(white_agent_url, task_prompt, action_budget, deadline)
+        result["trace_id"] = root.trace_id
+        return result
+
+
+async def _run_assessment(white_agent_url: str, task_prompt: str, action_budget: int, deadline: float | None) -> dict:
+    execution_log = []
+    timings = {}
+    started = time.perf_counter()
+
+    # The White Agent must stop a margin before whichever comes first, our client timeout or
+    # our own caller's deadline, so its partial evidence still arrives in time to be graded.
+    white_deadline = time.time() + A2A_TIMEOUT_SECONDS - DEADLINE_MARGIN_SECONDS
+    if deadline is not None:
+        white_deadline = min(white_deadline, deadline - DEADLINE_MARGIN_SECONDS)
+
+    with tracing.span("white_agent.call"):
+        response_obj = await send_message(
+            white_agent_url, task_prompt, metadata=tracing.inject(budget_metadata(white_deadline))
+        )
+    timings["white_agent_seconds"] = round(time.perf_counter() - started, 3)
+
+    with EvidenceSpool() as spool:
+        # The payload is parsed and spooled to disk as soon as it arrives, with no await in
+        # between, so it is never held while waiting. Grading then only holds file paths.
+        text_parts = get_text_parts(response_obj.root.result.parts)
+        white_resp = text_parts[0] if text_parts else ""
+        del response_obj, text_parts
+        response_bytes = len(white_resp)
+        try:
+            data = json.loads(white_resp)
+        except json.JSONDecodeError:
+            data = None
+
+        if data is not None:
+            del white_resp
+            evidence = data.get("evidence_bundle", data)
+            action_trace = evidence.get("action_trace", "")
+            stopped_reason = data.get("stopped_reason")
+            # Decode screenshots to disk one at a time, releasing each base64 string as we go.
+            spool.add_all(evidence.get("screenshots", []))
+            del data, evidence
+            execution_log.append(f"✅ Received Evidence ({len(spool.paths)} screenshots).")
+            if stopped_reason:
+                execution_log.append(f"⏱️ White Agent stopped early ({stopped_reason}); grading partial evidence.")
+        else:
+            action_trace = white_resp
+            stopped_reason = None
+            execution_log.append("⚠️ Warning: Received raw text evidence.")
+        screenshots = spool.paths
+
+        execution_log.append("🧠 Grading with Gemini...")
+        actions_taken = len(action_trace.split('\n')) if action_trace else 0
+
+        # Key points are only needed by the model tiers, so skip them when the rules already decide.
+        phase_started = time.perf_counter()
+        if check_rules(screenshots, action_trace, actions_taken, action_budget) is None:
+            with tracing.span("grading.key_points"):
+                key_points = await asyncio.to_thread(deconstruct_task_to_key_points, task_prompt)
+        else:
+            key_points = []
+        timings["key_points_seconds"] = round(time.perf_counter() - phase_started, 3)
+
+        phase_started = time.perf_counter()
+        with tracing.span("grading.grade", screenshots=len(screenshots)):
+            eval_res, text_confidence = await asyncio.to_thread(
+                grade_without_images, key_points, screenshots, action_trace, actions_taken, action_budget
+            )
+            if eval_res is None:
+                eval_res = await _grade_with_images(
+                    spool, key_points, screenshots, action_trace, actions_taken, action_budget
+                )
+                eval_res = finish_vision_grade(eval_res, text_confidence, actions_taken, action_budget)
+        timings["grading_seconds"] = round(time.perf_counter() - phase_started, 3)
+        execution_log.append(f"⚖️ Decided by the {eval_res.get('grading_tier', 'vision')} grading tier.")
+    timings["total_seconds"] = round(time.perf_counter() - started, 3)
+
+    result = {
+        "white_agent_url": white_agent_url,
+        "task_prompt": task_prompt,
+        "action_budget": action_budget,
+        "actions_taken": actions_taken,
+        "key_points": key_points,
+        "final_verdict": eval_res.get("final_verdict", "UNKNOWN"),
+        "total_score": eval_res.get("total_score", 0),
+        "summary_reasoning": eval_res.get("summary_reasoning", "N/A"),
+        "rubric_scores": eval_res.get("rubric_scores", {}),
+        "grading_tier": eval_res.get("grading_tier"),
+        "grading_confidence": eval_res.get("confidence", eval_res.get("text_confidence")),
+        "error": eval_res.get("error"),
+        "evidence": {
+            "response_bytes": response_bytes,
+            "screenshots": len(screenshots),
+            "screenshot_bytes": spool.encoded_bytes,
+            "decoded_screenshot_bytes": spool.spooled_bytes,
+            # Image bytes the vision grader held at once (0 when a cheaper tier decided).
+            "graded_image_bytes": eval_res.pop("graded_image_bytes", 0),
+            "action_trace_bytes": len(action_trace),
+            "stopped_reason": stopped_reason,
+        },
+        "timings": timings,
+        "log": execution_log,
+    }
+
+    try:
+        result["run_id"] = await asyncio.to_thread(results_store.record, result)
+    except Exception as e:
+        print(f"⚠️ Could not record result: {e}")
+    return result
+
+
+async def _grade_with_images(
+    spool: EvidenceSpool, key_points: list, screenshots: list, action_trace: str, actions_taken: int, action_budget: int,
+) -> dict:
+    """
+    Runs the vision grader once a vision slot is free. Waiting happens here, not in a thread, so
+    queued gradings don't tie up the default executor and a cancelled waiter never starts the call.
+    The slot is released when the thread finishes, since it holds the images until Gemini answers.
+    """
+    await vision_slots.acquire()
+    grading = asyncio.ensure_future(asyncio.to_thread(
+        grade_agent_performance, key_points, screenshots, action_trace, actions_taken, action_budget
+    ))
+    grading.add_done_callback(lambda _: vision_slots.release())
+    try:
+        with tracing.span("grading.vision", screenshots=len(screenshots)):
+            return await asyncio.shield(grading)
+    except asyncio.CancelledError:
+        # The thread can't be interrupted: keep the spooled files until it is done with them.
+        spool.keep_until(grading)
+        raise
+
+
+def format_report(result: dict) -> str:
+    """Renders a structured result as the markdown verdict shown to humans."""
+    return f"""
+## 🏁 Verdict: {result.get("final_verdict", "UNKNOWN")}
+**Score:** {result.get("total_score", 0)}/100
+**Reasoning:** {result.get("summary_reasoning", "N/A")}
+
+### Details
+{result.get("rubric_scores", {})}
+    """
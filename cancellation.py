@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+# Time budget (seconds left) sent by the Green Agent in the A2A message metadata. It is relative
+# because the agents run on different hosts whose clocks may disagree; the receiver turns it
+# into a deadline on its own clock.
+TIME_BUDGET_KEY = "webjudge_time_budget"
+
+
+def deadline_from(metadata: dict | None) -> float | None:
+    """The local deadline (epoch seconds) for an incoming message's time budget, if it has one."""
+    try:
+        budget = float((metadata or {})[TIME_BUDGET_KEY])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return time.time() + budget
+
+
+def budget_metadata(deadline: float | None) -> dict:
+    """Metadata carrying the time left before `deadline`, for an outgoing message."""
+    if deadline is None:
+        return {}
+    return {TIME_BUDGET_KEY: round(remaining(deadline), 3)}
+
+
+def remaining(deadline: float | None) -> float | None:
+    """Seconds left before `deadline` (never negative), or None when there is no deadline."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+class RunningTask:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.reason = None
+        self.timer = None
+
+    def stop(self, reason: str) -> None:
+        """Cancels the task; `reason` ('cancelled' or 'deadline') tells the task why it was stopped."""
+        if self.reason is None:
+            self.reason = reason
+            self.task.cancel()
+
+
+class TaskRegistry:
+    """
+    Tracks the asyncio task running each A2A request so cancel() and deadlines can stop it.
+    The stopped task sees a CancelledError at its next await and can check `reason`.
+    """
+
+    def __init__(self):
+        self._running = {}
+
+    def start(self, key: str, deadline: float | None = None) -> RunningTask:
+        running = RunningTask(asyncio.current_task())
+        if deadline is not None:
+            running.timer = asyncio.get_running_loop().call_later(remaining(deadline), running.stop, "deadline")
+        self._running[key] = running
+        return running
+
+    def finish(self, key: str) -> None:
+        running = self._running.pop(key, None)
+        if running and running.timer:
+            running.timer.cancel()
+
+    def cancel(self, key: str) -> bool:
+        running = self._running.get(key)
+        if running is None:
+            return False
+        running.stop("cancelled")
+        return True
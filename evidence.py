@@ -0,0 +1,98 @@
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Where decoded screenshots are spooled while an assessment is graded (default: system temp dir).
+SPOOL_DIR = os.environ.get("WEBJUDGE_SPOOL_DIR")
+
+# Set WEBJUDGE_TRACE_MEMORY=1 to also measure the Python heap peak with tracemalloc (slower).
+TRACE_MEMORY = os.environ.get("WEBJUDGE_TRACE_MEMORY") == "1"
+if TRACE_MEMORY:
+    tracemalloc.start()
+
+class EvidenceSpool:
+    """
+    Screenshots decoded to files in a private temp directory, so grading holds file paths
+    instead of base64 strings. The directory is removed when the spool is closed.
+    """
+
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix="webjudge-evidence-", dir=SPOOL_DIR)
+        self.paths = []
+        self.encoded_bytes = 0
+        self.spooled_bytes = 0
+        self._in_use = None
+
+    def add(self, img_data) -> None:
+        if not isinstance(img_data, str):
+            return
+        if len(img_data) <= 200:
+            # Short strings are already file paths (same convention as grade_agent_performance).
+            self.paths.append(img_data)
+            return
+        self.encoded_bytes += len(img_data)
+        if "base64," in img_data:
+            img_data = img_data.split("base64,")[1]
+        try:
+            image_bytes = base64.b64decode(img_data)
+        except ValueError as e:
+            print(f"⚠️ Error decoding a screenshot: {e}")
+            return
+        path = os.path.join(self.dir, f"{len(self.paths):03d}.img")
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+        self.spooled_bytes += len(image_bytes)
+        self.paths.append(path)
+
+    def add_all(self, screenshots: list) -> None:
+        """Spools each screenshot and drops it from `screenshots` right away, so at most one is decoded at a time."""
+        for i in range(len(screenshots)):
+            self.add(screenshots[i])
+            screenshots[i] = None
+        screenshots.clear()
+
+    def keep_until(self, future) -> None:
+        """Defers removing the files until `future` (e.g. a grading thread still reading them) is done."""
+        self._in_use = future
+        future.add_done_callback(self._release)
+
+    def _release(self, future) -> None:
+        if not future.cancelled():
+            future.exception()  # retrieved here, since nobody awaits it any more
+        self.close()
+
+    def close(self) -> None:
+        if self._in_use is not None and not self._in_use.done():
+            return
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def memory_snapshot() -> dict:
+    """
+    Process-wide memory high-water marks so far: `process_peak_rss_mb` (the OS's peak RSS) and
+    `process_peak_traced_mb` (the Python heap peak, with WEBJUDGE_TRACE_MEMORY=1). They cover the
+    whole process lifetime and every assessment it has run, so they only ever go up; they are
+    for spotting growth across runs, not for the cost of one assessment.
+    """
+    snapshot = {"process_peak_rss_mb": None, "process_peak_traced_mb": None}
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        snapshot["process_peak_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if TRACE_MEMORY:
+        snapshot["process_peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    return snapshot
@@ -1,21 +1,97 @@
 # --- START OF FILE green_agent.py (Gemini Version) ---
 
 import os
+import sys
 import json
-import google.generativeai as genai
-from PIL import Image
 import io
 import base64
 
+import tracing
 
-try:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-except KeyError:
-    print("❌ ERROR: The GOOGLE_API_KEY environment variable is not set.")
-    exit()
+# google.generativeai and PIL are slow to import, so they are loaded on first use
+# (or by warm_up() from the server's lifespan hook) instead of at module load.
+_genai = None
+_model = None
 
 
-model = genai.GenerativeModel('gemini-flash-latest')
+def require_api_key() -> None:
+    """Exits when GOOGLE_API_KEY is not set: without it every verdict would be a model error."""
+    if not os.environ.get("GOOGLE_API_KEY"):
+        print("❌ ERROR: The GOOGLE_API_KEY environment variable is not set.")
+        sys.exit(1)
+
+
+def get_genai():
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        try:
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+        except KeyError:
+            print("❌ ERROR: The GOOGLE_API_KEY environment variable is not set.")
+            raise RuntimeError("GOOGLE_API_KEY is not set.")
+        _genai = genai
+    return _genai
+
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = get_genai().GenerativeModel('gemini-flash-latest')
+    return _model
+
+
+def warm_up() -> None:
+    """Imports the heavy dependencies and opens the model client so the first assessment doesn't pay for it."""
+    from PIL import Image  # noqa: F401
+    get_model().count_tokens("ping")
+
+RUBRIC_PROMPT = """
+    You are an automated evaluator for web-browsing agents. Your task is to grade an agent's performance based on the provided evidence and a strict rubric.
+    You must score the agent out of 100 points and provide a final verdict ('SUCCESS' or 'FAILURE').
+
+    ### Rubric (100 points total)
+    1.  **Goal Completion (40 points):**
+        - 40 pts: The agent reached a final page/product that correctly satisfies ALL critical constraints.
+        - Between 1-39 pts: The agent partially met the goal, satisfying some constraints but not all. Give proportional points based on how well it performed.
+        - 0 pts: The final product is incorrect.
+    2.  **Constraint Adherence (40 points):**
+        - Award points proportionally for each constraint from the list that is verifiably met in the evidence.
+        - **CRITICAL RULE:** If a critical constraint (e.g., price, rating, specific item attribute) is violated, this ENTIRE section scores 0 points, leading to an automatic task failure.
+    3.  **Efficiency (10 points):**
+        - 10 pts: Actions taken are less than or equal to the action budget.
+        - 0 pts: Actions taken exceed the action budget.
+    4.  **Evidence Quality (10 points):**
+        - 10 pts: The screenshots and action log provide clear, unambiguous proof for the final decision.
+        - 5 pts: The evidence is present but confusing or incomplete.
+        - 0 pts: The evidence does not support the agent's final answer.
+
+    ### Final Verdict
+    - **SUCCESS:** The total score is > 80 AND no critical constraints were violated.
+    - **FAILURE:** The total score is <= 80 OR any critical constraint was violated.
+
+    You MUST respond in a valid JSON format with the following structure:
+    {
+      "rubric_scores": {
+        "goal_completion": {"score": <number>, "reasoning": "<text>"},
+        "constraint_adherence": {"score": <number>, "reasoning": "<text>"},
+        "efficiency": {"score": <number>, "reasoning": "<text>"},
+        "evidence_quality": {"score": <number>, "reasoning": "<text>"}
+      },
+      "total_score": <number>,
+      "final_verdict": "<'SUCCESS' or 'FAILURE'>",
+      "summary_reasoning": "<A brief, overall summary of the performance.>"
+    }
+    """
+
+# Screenshots sent to the vision grader: only the last MAX_GRADED_SCREENSHOTS, each at most
+# MAX_IMAGE_SIDE pixels on its longest side, so the memory held per grading is bounded.
+MAX_GRADED_SCREENSHOTS = int(os.environ.get("WEBJUDGE_MAX_GRADED_SCREENSHOTS", 10))
+MAX_IMAGE_SIDE = int(os.environ.get("WEBJUDGE_MAX_IMAGE_SIDE", 1280))
+
+# Cascaded grading: escalate from the text-only pass to the vision grader when its
+# confidence (0-1) is below this threshold.
+ESCALATION_THRESHOLD = float(os.environ.get("WEBJUDGE_ESCALATION_THRESHOLD", 0.8))
 
 def deconstruct_task_to_key_points(task_prompt: str) -> list:
     """Uses Gemini to convert a natural language task into a list of key, verifiable points."""
@@ -38,12 +114,11 @@ def deconstruct_task_to_key_points(task_prompt: str) -> list:
     
     # 3. Switched to Gemini model call with JSON output config
     # We instruct the model to only output JSON.
-    generation_config = genai.GenerationConfig(response_mime_type="application/json")
-    
     prompt = f"{system_prompt}\n\nHere is the task: {task_prompt}"
     
     try:
-        response = model.generate_content(prompt, generation_config=generation_config)
+        generation_config = get_genai().GenerationConfig(response_mime_type="application/json")
+        response = get_model().generate_content(prompt, generation_config=generation_config)
         data = json.loads(response.text)
         key_points = data["constraints"]
         print(f"✅ Deconstructed Task into Key Points: {key_points}")
@@ -52,65 +127,51 @@ def deconstruct_task_to_key_points(task_prompt: str) -> list:
         print(f"❌ Error parsing key points from Gemini: {e}")
         return []
 
+def load_image_part(img_data: str) -> dict:
+    """
+    Loads one screenshot (base64 string or file path) as an image blob for Gemini. Images that
+    fit in MAX_IMAGE_SIDE are passed through undecoded; larger ones are downsized and re-encoded.
+    Either way the decoded pixels are released before returning.
+    """
+    from PIL import Image
+
+    if len(img_data) > 200:
+        if "base64," in img_data:
+            img_data = img_data.split("base64,")[1]
+        image_bytes = base64.b64decode(img_data)
+    else:
+        with open(img_data, "rb") as f:
+            image_bytes = f.read()
+
+    # Image.open only reads the header; pixels are decoded by thumbnail() if a resize is needed.
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        mime_type = Image.MIME.get(img.format, "image/png")
+        if max(img.size) <= MAX_IMAGE_SIDE:
+            return {"mime_type": mime_type, "data": image_bytes}
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return {"mime_type": "image/jpeg", "data": buffer.getvalue()}
+
 def grade_agent_performance(key_points: list, screenshots: list, action_log: str, actions_taken: int, action_budget: int) -> dict:
     """
     Uses Gemini Vision to grade the agent's performance based on a detailed rubric.
+    Screenshots may be base64 strings or file paths (e.g. from an EvidenceSpool).
     """
-    
+    if len(screenshots) > MAX_GRADED_SCREENSHOTS:
+        print(f"✂️ Grading the last {MAX_GRADED_SCREENSHOTS} of {len(screenshots)} screenshots.")
+        screenshots = screenshots[-MAX_GRADED_SCREENSHOTS:]
+
     image_parts = []
     for img_data in screenshots:
         try:
             if isinstance(img_data, str):
-                if len(img_data) > 200: 
-                    if "base64," in img_data:
-                        img_data = img_data.split("base64,")[1]
-                    
-                    image_bytes = base64.b64decode(img_data)
-                    image_parts.append(Image.open(io.BytesIO(image_bytes)))
-                
-                else:
-                    image_parts.append(Image.open(img_data))
+                image_parts.append(load_image_part(img_data))
         except Exception as e:
             print(f"⚠️ Error processing an image: {e}")
             continue
 
-    system_prompt = """
-    You are an automated evaluator for web-browsing agents. Your task is to grade an agent's performance based on the provided evidence and a strict rubric.
-    You must score the agent out of 100 points and provide a final verdict ('SUCCESS' or 'FAILURE').
-
-    ### Rubric (100 points total)
-    1.  **Goal Completion (40 points):**
-        - 40 pts: The agent reached a final page/product that correctly satisfies ALL critical constraints.
-        - Between 1-39 pts: The agent partially met the goal, satisfying some constraints but not all. Give proportional points based on how well it performed.
-        - 0 pts: The final product is incorrect.
-    2.  **Constraint Adherence (40 points):**
-        - Award points proportionally for each constraint from the list that is verifiably met in the evidence.
-        - **CRITICAL RULE:** If a critical constraint (e.g., price, rating, specific item attribute) is violated, this ENTIRE section scores 0 points, leading to an automatic task failure.
-    3.  **Efficiency (10 points):**
-        - 10 pts: Actions taken are less than or equal to the action budget.
-        - 0 pts: Actions taken exceed the action budget.
-    4.  **Evidence Quality (10 points):**
-        - 10 pts: The screenshots and action log provide clear, unambiguous proof for the final decision.
-        - 5 pts: The evidence is present but confusing or incomplete.
-        - 0 pts: The evidence does not support the agent's final answer.
-
-    ### Final Verdict
-    - **SUCCESS:** The total score is > 80 AND no critical constraints were violated.
-    - **FAILURE:** The total score is <= 80 OR any critical constraint was violated.
-
-    You MUST respond in a valid JSON format with the following structure:
-    {
-      "rubric_scores": {
-        "goal_completion": {"score": <number>, "reasoning": "<text>"},
-        "constraint_adherence": {"score": <number>, "reasoning": "<text>"},
-        "efficiency": {"score": <number>, "reasoning": "<text>"},
-        "evidence_quality": {"score": <number>, "reasoning": "<text>"}
-      },
-      "total_score": <number>,
-      "final_verdict": "<'SUCCESS' or 'FAILURE'>",
-      "summary_reasoning": "<A brief, overall summary of the performance.>"
-    }
-    """
+    system_prompt = RUBRIC_PROMPT
     
     user_prompt = f"""
     Please evaluate the following agent's performance based on the attached screenshots and the provided information.
@@ -132,16 +193,179 @@ def grade_agent_performance(key_points: list, screenshots: list, action_log: str
     
     # 4. Assembled a multi-part prompt (text + images) for Gemini
     prompt_parts = [user_prompt] + image_parts
-    generation_config = genai.GenerationConfig(response_mime_type="application/json")
+    # Every loaded image is held until Gemini answers, so this is the grading's peak image memory.
+    graded_image_bytes = sum(len(part["data"]) for part in image_parts)
 
     try:
-        response = model.generate_content(prompt_parts, generation_config=generation_config)
+        generation_config = get_genai().GenerationConfig(response_mime_type="application/json")
+        response = get_model().generate_content(prompt_parts, generation_config=generation_config)
         evaluation = json.loads(response.text)
         print("✅ Grading Complete.")
-        return evaluation
     except (json.JSONDecodeError, KeyError, Exception) as e:
         print(f"❌ Error parsing grading results from Gemini: {e}")
-        return {"final_verdict": "FAILURE", "summary_reasoning": "Error during evaluation."}
+        evaluation = {"final_verdict": "FAILURE", "summary_reasoning": "Error during evaluation.", "error": str(e)}
+    evaluation["graded_image_bytes"] = graded_image_bytes
+    return evaluation
+
+
+def budget_score(actions_taken: int, action_budget: int) -> dict:
+    """The efficiency rubric item is a plain comparison, so it is never left to the model."""
+    if actions_taken <= action_budget:
+        return {"score": 10, "reasoning": f"{actions_taken} actions within the budget of {action_budget}."}
+    return {"score": 0, "reasoning": f"{actions_taken} actions exceed the budget of {action_budget}."}
+
+
+def rubric_score(item) -> float:
+    """
+    The score of one rubric item. Models usually return {"score": ..., "reasoning": ...} but
+    sometimes just the number; a missing or unreadable score counts as 0.
+    """
+    if isinstance(item, dict):
+        item = item.get("score")
+    try:
+        return float(item)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def apply_budget_score(evaluation: dict, actions_taken: int, action_budget: int) -> dict:
+    """Replaces the model's efficiency score with the deterministic one and recomputes the total and verdict."""
+    rubric = evaluation.get("rubric_scores")
+    if not isinstance(rubric, dict):
+        return evaluation
+    for key, item in rubric.items():
+        if not isinstance(item, dict):
+            rubric[key] = {"score": rubric_score(item)}
+    rubric["efficiency"] = budget_score(actions_taken, action_budget)
+    evaluation["total_score"] = sum(rubric_score(item) for item in rubric.values())
+    if evaluation.get("final_verdict") == "SUCCESS" and evaluation["total_score"] <= 80:
+        evaluation["final_verdict"] = "FAILURE"
+    return evaluation
+
+
+def check_rules(screenshots: list, action_log: str, actions_taken: int, action_budget: int) -> dict | None:
+    """
+    Tier 0: deterministic checks. Returns a full evaluation when the outcome is already clear
+    from the evidence shape alone, otherwise None.
+    """
+    reason = None
+    if not screenshots and not action_log.strip():
+        reason = "The agent returned no screenshots and no action log."
+    elif not screenshots:
+        reason = "The agent returned no screenshots, so no constraint can be verified."
+    elif "CRITICAL ERROR" in action_log and len(screenshots) <= 1:
+        reason = "The agent crashed (CRITICAL ERROR) before reaching any result page."
+    if reason is None:
+        return None
+
+    return {
+        "rubric_scores": {
+            "goal_completion": {"score": 0, "reasoning": reason},
+            "constraint_adherence": {"score": 0, "reasoning": reason},
+            "efficiency": budget_score(actions_taken, action_budget),
+            "evidence_quality": {"score": 0, "reasoning": reason},
+        },
+        "total_score": budget_score(actions_taken, action_budget)["score"],
+        "final_verdict": "FAILURE",
+        "summary_reasoning": reason,
+        "confidence": 1.0,
+    }
+
+
+def grade_text_only(key_points: list, action_log: str, actions_taken: int, action_budget: int) -> dict:
+    """
+    Tier 1: grades from the action log and key points alone (no images) and reports how
+    confident it is that the screenshots would not change the verdict. Only its FAILURE
+    verdicts are final (see grade_agent_cascaded).
+    """
+    user_prompt = f"""
+    Please evaluate the following agent's performance based ONLY on its action log. You do not have the screenshots.
+
+    **System Instructions:**
+    {RUBRIC_PROMPT}
+
+    Also add a "confidence" field (a number between 0 and 1) to your JSON: how sure you are that
+    the screenshots would not change your verdict. Use a low confidence whenever a constraint can
+    only be checked visually (price, rating, product attributes shown on the page).
+
+    **Task Constraints to Verify:**
+    {json.dumps(key_points, indent=2)}
+
+    **Efficiency Constraints:**
+    - Action Budget: {action_budget}
+    - Actions Taken: {actions_taken}
+
+    **Agent's Evidence:**
+    - Action Log: "{action_log}"
+    """
+
+    try:
+        generation_config = get_genai().GenerationConfig(response_mime_type="application/json")
+        response = get_model().generate_content(user_prompt, generation_config=generation_config)
+        evaluation = json.loads(response.text)
+        evaluation["confidence"] = float(evaluation.get("confidence", 0))
+        return evaluation
+    except (json.JSONDecodeError, KeyError, Exception) as e:
+        print(f"❌ Error parsing text-only grading from Gemini: {e}")
+        return {"final_verdict": "FAILURE", "summary_reasoning": "Error during evaluation.", "confidence": 0.0, "error": str(e)}
+
+
+def grade_without_images(key_points: list, screenshots: list, action_log: str, actions_taken: int, action_budget: int,
+                         threshold: float = ESCALATION_THRESHOLD) -> tuple:
+    """
+    The tiers of the cascade that load no images: rule checks, then the text-only pass.
+    Returns (evaluation, text confidence); the evaluation is None when the vision grader must decide.
+    """
+    with tracing.span("grading.rules"):
+        evaluation = check_rules(screenshots, action_log, actions_taken, action_budget)
+    if evaluation is not None:
+        print("✅ Grading decided by rule checks.")
+        evaluation["grading_tier"] = "rules"
+        return evaluation, 1.0
+
+    with tracing.span("grading.text"):
+        evaluation = grade_text_only(key_points, action_log, actions_taken, action_budget)
+    confidence = evaluation.get("confidence", 0.0)
+    # The action log is written by the agent under test, so it can fail a run but never pass
+    # one: a SUCCESS always has to be confirmed against the screenshots.
+    if evaluation.get("final_verdict") == "FAILURE" and confidence >= threshold:
+        print(f"✅ Grading decided by text-only pass (confidence {confidence:.2f}).")
+        evaluation["grading_tier"] = "text"
+        rubric = evaluation.get("rubric_scores")
+        if isinstance(rubric, dict):
+            # Evidence quality is judged from the screenshots, which this tier never saw.
+            rubric.pop("evidence_quality", None)
+        return apply_budget_score(evaluation, actions_taken, action_budget), confidence
+
+    if evaluation.get("final_verdict") == "FAILURE":
+        print(f"🔎 Text-only confidence {confidence:.2f} < {threshold}, escalating to vision grader.")
+    else:
+        print("🔎 Text-only pass found no failure, confirming with the vision grader.")
+    return None, confidence
+
+
+def finish_vision_grade(evaluation: dict, text_confidence: float, actions_taken: int, action_budget: int) -> dict:
+    """
+    Labels a vision grader result as the deciding tier and applies the budget score. A grader
+    failure is labelled "error" instead: its FAILURE says nothing about the agent.
+    """
+    evaluation["grading_tier"] = "error" if evaluation.get("error") else "vision"
+    evaluation["text_confidence"] = text_confidence
+    return apply_budget_score(evaluation, actions_taken, action_budget)
+
+
+def grade_agent_cascaded(key_points: list, screenshots: list, action_log: str, actions_taken: int, action_budget: int,
+                         threshold: float = ESCALATION_THRESHOLD) -> dict:
+    """
+    Grades with the cheapest tier that is confident enough: rule checks, then a text-only pass,
+    then the full multimodal grader. The result records which tier decided in "grading_tier".
+    """
+    evaluation, confidence = grade_without_images(key_points, screenshots, action_log, actions_taken, action_budget, threshold)
+    if evaluation is not None:
+        return evaluation
+    with tracing.span("grading.vision", screenshots=len(screenshots)):
+        evaluation = grade_agent_performance(key_points, screenshots, action_log, actions_taken, action_budget)
+    return finish_vision_grade(evaluation, confidence, actions_taken, action_budget)
 
 
 def evaluate_white_agent_output(white_agent_payload: dict) -> dict:
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+# SQLite file shared by the A2A front end and the workers. For workers on several nodes,
+# put it on a shared volume and use the DELETE journal (WAL needs a single host).
+QUEUE_PATH = os.environ.get("WEBJUDGE_QUEUE_PATH", "webjudge_jobs.db")
+QUEUE_JOURNAL = os.environ.get("WEBJUDGE_QUEUE_JOURNAL", "WAL")
+MAX_ATTEMPTS = int(os.environ.get("WEBJUDGE_JOB_MAX_ATTEMPTS", 3))
+LEASE_SECONDS = float(os.environ.get("WEBJUDGE_JOB_LEASE", 600))
+RETRY_BACKOFF = float(os.environ.get("WEBJUDGE_JOB_BACKOFF", 5))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at);
+"""
+
+
+class JobQueue:
+    """
+    Durable assessment queue on a local SQLite file.
+    Job lifecycle: queued -> running -> done | failed (requeued while attempts remain),
+    or queued -> cancelled.
+    A running job whose lease expires (worker crashed or restarted) is picked up again, so a
+    worker renews its lease while it runs and only the current lease holder can finish a job.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={QUEUE_JOURNAL}")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, payload: dict, max_attempts: int = MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, max_attempts, available_at, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), max_attempts, now, now, now),
+            )
+        return job_id
+
+    def claim(self, worker: str) -> dict | None:
+        """Atomically takes the oldest runnable job and leases it to `worker`."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Expired leases that already used every attempt are given up on.
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ?"
+                " WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?)"
+                " OR (status = 'running' AND lease_expires_at < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,"
+                " lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (worker, now + LEASE_SECONDS, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def extend_lease(self, job_id: str, worker: str) -> bool:
+        """Renews `worker`'s lease on a running job. Returns False if the job is no longer leased to it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ?"
+                " WHERE id = ? AND status = 'running' AND worker = ?",
+                (now + LEASE_SECONDS, now, job_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id: str, worker: str, result: dict) -> bool:
+        """Stores the result. Returns False (and changes nothing) if `worker` lost the lease."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires_at = NULL,"
+                " updated_at = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                (json.dumps(result), time.time(), job_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> str:
+        """
+        Records a failed attempt. Returns the new status ('queued' if it will be retried),
+        or 'lost' if `worker` no longer holds the lease and the job was left alone.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'running' AND worker = ?",
+                (job_id, worker),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return "lost"
+            if retry and row["attempts"] < row["max_attempts"]:
+                status = "queued"
+                available_at = now + RETRY_BACKOFF * row["attempts"]
+            else:
+                status = "failed"
+                available_at = now
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires_at = NULL,"
+                " updated_at = ? WHERE id = ?",
+                (status, error, available_at, now, job_id),
+            )
+            conn.execute("COMMIT")
+        return status
+
+    def cancel(self, job_id: str) -> bool:
+        """Drops a job that no worker has claimed yet. Returns False if it already started."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
@@ -1,8 +1,15 @@
+from startup import StartupState, PREWARM
+
+STARTUP = StartupState()
+
 import uvicorn
 import tomli
 import json
 import re
 import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
 
 from starlette.responses import JSONResponse, Response
 from starlette.middleware import Middleware
@@ -13,15 +20,33 @@ from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCard
-from a2a.utils import new_agent_text_message, get_text_parts
+from a2a.server.tasks import InMemoryTaskStore, TaskUpdater
+from a2a.types import AgentCard, Part, TextPart, DataPart
+from a2a.utils import new_agent_text_message, new_agent_parts_message, get_data_parts
 
-from my_a2a import send_message
-from green_agentv2 import grade_agent_performance, deconstruct_task_to_key_points
+from assessment import run_assessment, format_report, results_store
+from job_queue import JobQueue
+from green_agentv2 import warm_up, require_api_key
+import tracing
+from cancellation import TaskRegistry, deadline_from
+from evidence import memory_snapshot
 
 RENDER_URL = "https://webjudge-project.onrender.com"
 
+# "inline" grades inside the A2A request; "queue" hands the job to worker.py processes.
+MODE = os.environ.get("WEBJUDGE_MODE", "inline")
+JOB_WAIT_SECONDS = float(os.environ.get("WEBJUDGE_JOB_WAIT", 110))
+JOB_POLL_SECONDS = 1.0
+
+job_queue = JobQueue() if MODE == "queue" else None
+# Inline mode grades in this process, so it can't start without a Gemini key.
+if job_queue is None:
+    require_api_key()
+
+tracing.set_service("green-agent")
+
+STARTUP.mark_imported()
+
 def parse_tags(text):
     tags = {}
     for tag in ["white_agent_url", "task_prompt", "action_budget"]:
@@ -31,70 +56,130 @@ def parse_tags(text):
             tags[tag] = match.group(1).strip()
     return tags
 
+def parse_inputs(context: RequestContext) -> dict:
+    """
+    Reads the assessment request, preferring structured input: a DataPart, then a JSON
+    text body, then the legacy <tag> format.
+    """
+    data_parts = get_data_parts(context.message.parts) if context.message else []
+    if data_parts:
+        return data_parts[0]
+
+    user_input = context.get_user_input()
+    try:
+        data = json.loads(user_input)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+    return parse_tags(user_input)
+
+def parse_action_budget(value):
+    """Reads action_budget, returning None when it isn't a positive integer."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        budget = int(value)
+    except (TypeError, ValueError):
+        return None
+    return budget if budget > 0 else None
+
 class WebJudgeExecutor(AgentExecutor):
+    def __init__(self):
+        self.running_tasks = TaskRegistry()
+
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
         print("🟢 WebJudge: Orchestration Start.")
+        STARTUP.mark_task()
         
         execution_log = []
         
-        user_input = context.get_user_input()
-        inputs = parse_tags(user_input)
+        inputs = parse_inputs(context)
         
         white_agent_url = inputs.get("white_agent_url")
         task_prompt = inputs.get("task_prompt", "Default task")
-        action_budget = int(inputs.get("action_budget", 10))
+        action_budget = parse_action_budget(inputs.get("action_budget", 10))
 
-        if not white_agent_url:
+        if not isinstance(white_agent_url, str) or not white_agent_url.strip():
             await event_queue.enqueue_event(new_agent_text_message("❌ Error: No <white_agent_url>."))
             return
+        if action_budget is None:
+            await event_queue.enqueue_event(new_agent_text_message("❌ Error: <action_budget> must be a positive integer."))
+            return
+        white_agent_url = white_agent_url.strip()
 
         execution_log.append(f"📡 Orchestrating Task: {task_prompt}")
         execution_log.append(f"👉 Target Agent: {white_agent_url}\n")
 
-        try:
-            response_obj = await send_message(white_agent_url, task_prompt)
-            res_result = response_obj.root.result
-            text_parts = get_text_parts(res_result.parts)
-            white_resp = text_parts[0] if text_parts else ""
-            
+        metadata = context.message.metadata if context.message else None
+        deadline = deadline_from(metadata)
+        # Announcing the task first gives the caller its id, so it can send tasks/cancel.
+        await TaskUpdater(event_queue, context.task_id, context.context_id).start_work()
+        running = self.running_tasks.start(context.task_id, deadline)
+        with tracing.span("webjudge.execute", parent=tracing.extract(metadata), task_prompt=task_prompt):
             try:
-                data = json.loads(white_resp)
-                evidence = data.get("evidence_bundle", data)
-                screenshots = evidence.get("screenshots", [])
-                action_trace = evidence.get("action_trace", "")
-                execution_log.append(f"✅ Received Evidence ({len(screenshots)} screenshots).")
-            except json.JSONDecodeError:
-                screenshots = []
-                action_trace = white_resp
-                execution_log.append("⚠️ Warning: Received raw text evidence.")
-
-            execution_log.append("🧠 Grading with Gemini...")
-            key_points = deconstruct_task_to_key_points(task_prompt)
-            actions_taken = len(action_trace.split('\n')) if action_trace else 0
-            
-            eval_res = grade_agent_performance(
-                key_points, screenshots, action_trace, actions_taken, action_budget
-            )
-            
-            report = f"""
-## 🏁 Verdict: {eval_res.get("final_verdict", "UNKNOWN")}
-**Score:** {eval_res.get("total_score", 0)}/100
-**Reasoning:** {eval_res.get("summary_reasoning", "N/A")}
-
-### Details
-{eval_res.get("rubric_scores", {})}
-            """
-            execution_log.append(report)
-        
-            full_response = "\n".join(execution_log)
-            await event_queue.enqueue_event(new_agent_text_message(full_response))
+                if job_queue is None:
+                    result = await run_assessment(white_agent_url, task_prompt, action_budget, deadline=deadline)
+                else:
+                    job = await self._run_queued(white_agent_url, task_prompt, action_budget, deadline)
+                    if job["status"] != "done":
+                        execution_log.append(f"⏳ Job {job['id']} is still {job['status']}. Query /jobs/{job['id']} for the result.")
+                        await event_queue.enqueue_event(new_agent_text_message("\n".join(execution_log)))
+                        return
+                    result = job["result"]
+
+                execution_log.extend(result["log"])
+                execution_log.append(format_report(result))
+                full_response = "\n".join(execution_log)
+                await event_queue.enqueue_event(new_agent_parts_message([
+                    Part(TextPart(text=full_response)),
+                    Part(DataPart(data=result)),
+                ]))
+
+            except asyncio.CancelledError:
+                print(f"🛑 WebJudge: Assessment stopped ({running.reason}).")
+                if running.reason != "deadline":
+                    raise
+                execution_log.append("⏰ Deadline reached before the assessment finished.")
+                await event_queue.enqueue_event(new_agent_text_message("\n".join(execution_log)))
+
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                await event_queue.enqueue_event(new_agent_text_message(f"Error during execution: {e}"))
+
+            finally:
+                self.running_tasks.finish(context.task_id)
 
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            await event_queue.enqueue_event(new_agent_text_message(f"Error during execution: {e}"))
+    async def _run_queued(self, white_agent_url: str, task_prompt: str, action_budget: int, deadline: float | None) -> dict:
+        """Enqueues the assessment and waits up to JOB_WAIT_SECONDS for a worker to finish it."""
+        with tracing.span("queue.wait"):
+            job_id = await asyncio.to_thread(job_queue.enqueue, {
+                "white_agent_url": white_agent_url,
+                "task_prompt": task_prompt,
+                "action_budget": action_budget,
+                "traceparent": tracing.current_traceparent(),
+                "deadline": deadline,
+            })
+            print(f"🗂️ WebJudge: Queued job {job_id}")
+
+            wait_until = time.monotonic() + JOB_WAIT_SECONDS
+            try:
+                while True:
+                    job = await asyncio.to_thread(job_queue.get, job_id)
+                    if job["status"] == "failed":
+                        raise RuntimeError(f"Job {job_id} failed after {job['attempts']} attempts: {job['error']}")
+                    if job["status"] == "done" or time.monotonic() >= wait_until:
+                        return job
+                    await asyncio.sleep(JOB_POLL_SECONDS)
+            except asyncio.CancelledError:
+                # A job no worker has claimed yet is dropped; a running one finishes on its own deadline.
+                await asyncio.to_thread(job_queue.cancel, job_id)
+                raise
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        pass
+        if self.running_tasks.cancel(context.task_id):
+            print(f"🛑 WebJudge: Cancelling task {context.task_id}")
+        await TaskUpdater(event_queue, context.task_id, context.context_id).cancel()
 
 try:
     with open("agent-card.toml", "rb") as f:
@@ -105,6 +190,25 @@ except Exception:
 card_data["url"] = RENDER_URL
 AGENT_CARD_JSON = json.dumps(card_data)
 
+
+async def _warm_up():
+    # In queue mode the workers grade, so the front end has nothing to warm.
+    try:
+        if PREWARM and job_queue is None:
+            await asyncio.to_thread(warm_up)
+        STARTUP.mark_ready()
+    except Exception as e:
+        STARTUP.mark_ready(error=e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so /health answers (live, not ready) while it runs.
+    warmup_task = asyncio.create_task(_warm_up())
+    yield
+    warmup_task.cancel()
+
+
 a2a_app = A2AStarletteApplication(
     agent_card=AgentCard(**card_data),
     http_handler=DefaultRequestHandler(
@@ -113,7 +217,7 @@ a2a_app = A2AStarletteApplication(
     ),
 )
 
-app = a2a_app.build()
+app = a2a_app.build(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -132,12 +236,68 @@ async def get_card(request):
 async def get_status(request):
     if request.method == "HEAD":
         return Response(media_type="application/json")
-    return JSONResponse({"status": "ok", "agent": card_data.get("name")})
+    return JSONResponse(STARTUP.health(agent=card_data.get("name"), mode=MODE, memory=memory_snapshot()))
+
+async def get_ready(request):
+    status_code = 200 if STARTUP.ready else 503
+    if request.method == "HEAD":
+        return Response(media_type="application/json", status_code=status_code)
+    return JSONResponse(STARTUP.health(agent=card_data.get("name"), mode=MODE), status_code=status_code)
+
+async def get_job(request):
+    if job_queue is None:
+        return JSONResponse({"error": "Queue mode is disabled."}, status_code=404)
+    job = await asyncio.to_thread(job_queue.get, request.path_params["job_id"])
+    if job is None:
+        return JSONResponse({"error": "Unknown job."}, status_code=404)
+    return JSONResponse(job)
+
+async def get_jobs(request):
+    if job_queue is None:
+        return JSONResponse({"error": "Queue mode is disabled."}, status_code=404)
+    return JSONResponse(await asyncio.to_thread(job_queue.counts))
+
+def parse_limit(request, default=50, maximum=1000):
+    """Reads ?limit=, returning None when it isn't a positive integer."""
+    try:
+        limit = int(request.query_params.get("limit", default))
+    except ValueError:
+        return None
+    return min(limit, maximum) if limit > 0 else None
+
+async def get_leaderboard(request):
+    limit = parse_limit(request)
+    if limit is None:
+        return JSONResponse({"error": "limit must be a positive integer."}, status_code=400)
+    return JSONResponse(await asyncio.to_thread(results_store.leaderboard, limit))
+
+async def get_task_results(request):
+    limit = parse_limit(request)
+    if limit is None:
+        return JSONResponse({"error": "limit must be a positive integer."}, status_code=400)
+    return JSONResponse(await asyncio.to_thread(results_store.task_summary, limit))
+
+async def get_tier_results(request):
+    return JSONResponse(await asyncio.to_thread(results_store.tier_summary))
+
+async def get_comparison(request):
+    baseline = request.query_params.get("baseline")
+    candidate = request.query_params.get("candidate")
+    if not baseline or not candidate:
+        return JSONResponse({"error": "Pass ?baseline=<url>&candidate=<url>."}, status_code=400)
+    return JSONResponse(await asyncio.to_thread(results_store.compare, baseline, candidate))
 
 app.add_route("/", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/.well-known/agent-card.json", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/health", get_status, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/status", get_status, methods=["GET", "HEAD", "OPTIONS"])
+app.add_route("/ready", get_ready, methods=["GET", "HEAD"])
+app.add_route("/jobs", get_jobs, methods=["GET"])
+app.add_route("/jobs/{job_id}", get_job, methods=["GET"])
+app.add_route("/results/leaderboard", get_leaderboard, methods=["GET"])
+app.add_route("/results/tasks", get_task_results, methods=["GET"])
+app.add_route("/results/tiers", get_tier_results, methods=["GET"])
+app.add_route("/results/compare", get_comparison, methods=["GET"])
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 9001))
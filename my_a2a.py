@@ -1,6 +1,7 @@
 import httpx
 import asyncio
 import uuid
+from contextlib import aclosing
 
 
 from a2a.client import A2ACardResolver, A2AClient
@@ -8,19 +9,33 @@ from a2a.types import (
     AgentCard,
     Part,
     TextPart,
+    DataPart,
     MessageSendParams,
     Message,
     Role,
+    Task,
+    TaskStatusUpdateEvent,
+    TaskArtifactUpdateEvent,
+    TaskIdParams,
+    CancelTaskRequest,
     SendMessageRequest,
     SendMessageResponse,
+    SendMessageSuccessResponse,
+    SendStreamingMessageRequest,
 )
 
 
+# Client timeout for a whole message/send round trip, including the White Agent's run.
+A2A_TIMEOUT_SECONDS = 120.0
+# How long to wait for the remote agent to acknowledge a tasks/cancel.
+CANCEL_TIMEOUT_SECONDS = 5.0
+
+
 async def get_agent_card(url: str) -> AgentCard | None:
-    httpx_client = httpx.AsyncClient()
-    resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
+    async with httpx.AsyncClient() as httpx_client:
+        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
 
-    card: AgentCard | None = await resolver.get_agent_card()
+        card: AgentCard | None = await resolver.get_agent_card()
 
     return card
 
@@ -45,23 +60,68 @@ async def wait_agent_ready(url, timeout=10):
 
 
 async def send_message(
-    url, message, task_id=None, context_id=None
+    url, message, task_id=None, context_id=None, data=None, metadata=None, timeout=A2A_TIMEOUT_SECONDS
 ) -> SendMessageResponse:
     card = await get_agent_card(url)
-    httpx_client = httpx.AsyncClient(timeout=120.0)
-    client = A2AClient(httpx_client=httpx_client, agent_card=card)
 
     message_id = uuid.uuid4().hex
+    parts = [Part(TextPart(text=message))]
+    if data is not None:
+        parts.append(Part(DataPart(data=data)))
     params = MessageSendParams(
         message=Message(
             role=Role.user,
-            parts=[Part(TextPart(text=message))],
+            parts=parts,
             message_id=message_id,
             task_id=task_id,
             context_id=context_id,
+            metadata=metadata,
         )
     )
     request_id = uuid.uuid4().hex
-    req = SendMessageRequest(id=request_id, params=params)
-    response = await client.send_message(request=req)
+    # Closing the client on return or cancellation drops the connection right away.
+    async with httpx.AsyncClient(timeout=timeout) as httpx_client:
+        client = A2AClient(httpx_client=httpx_client, agent_card=card)
+        if card.capabilities and card.capabilities.streaming:
+            return await _send_streaming(client, request_id, params, timeout)
+        req = SendMessageRequest(id=request_id, params=params)
+        response = await client.send_message(request=req)
     return response
+
+
+async def _send_streaming(client: A2AClient, request_id: str, params: MessageSendParams, timeout) -> SendMessageResponse:
+    """
+    Sends over message/stream so the remote task id is known as soon as the agent starts the
+    task. If we stop waiting (cancelled, timed out), the remote task is cancelled too instead
+    of running on until its own deadline. Returns the final reply like message/send does.
+    """
+    req = SendStreamingMessageRequest(id=request_id, params=params)
+    remote_task_id = None
+    try:
+        async with aclosing(client.send_message_streaming(request=req, http_kwargs={"timeout": timeout})) as stream:
+            async for chunk in stream:
+                event = getattr(chunk.root, "result", None)
+                if event is None:
+                    raise RuntimeError(f"Agent returned an error: {chunk.root.error}")
+                if isinstance(event, Task):
+                    remote_task_id = event.id
+                elif isinstance(event, (TaskStatusUpdateEvent, TaskArtifactUpdateEvent)):
+                    remote_task_id = event.task_id
+                elif isinstance(event, Message):
+                    return SendMessageResponse(root=SendMessageSuccessResponse(id=request_id, result=event))
+    except (asyncio.CancelledError, Exception):
+        if remote_task_id is not None:
+            await _cancel_remote_task(client, remote_task_id)
+        raise
+    raise RuntimeError("Agent closed the stream without replying.")
+
+
+async def _cancel_remote_task(client: A2AClient, task_id: str) -> None:
+    try:
+        await asyncio.wait_for(
+            client.cancel_task(request=CancelTaskRequest(id=uuid.uuid4().hex, params=TaskIdParams(id=task_id))),
+            CANCEL_TIMEOUT_SECONDS,
+        )
+        print(f"🛑 Cancelled remote task {task_id}")
+    except Exception as e:
+        print(f"⚠️ Could not cancel remote task {task_id}: {e}")
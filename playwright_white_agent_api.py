@@ -1,20 +1,27 @@
+from startup import StartupState, PREWARM
+
+STARTUP = StartupState()
+
 import uvicorn
 import tomli
 import json
 import os
 import base64
 import asyncio
+from contextlib import asynccontextmanager
 from starlette.responses import JSONResponse, Response
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
-from playwright.async_api import async_playwright
+
+import tracing
+from cancellation import TaskRegistry, deadline_from
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCard
+from a2a.server.tasks import InMemoryTaskStore, TaskUpdater
+from a2a.types import AgentCard, Part, TextPart
 from a2a.utils import new_agent_text_message
 
 # PUT YOUR WHITE AGENT URL HERE (IT MIGHT HAVE CHANGED)
@@ -23,23 +30,52 @@ AGENT_URL = "https://unannoyed-alda-emigrational.ngrok-free.dev"
 def screenshot_to_base64(screenshot_bytes):
     return base64.b64encode(screenshot_bytes).decode('utf-8')
 
+tracing.set_service("naive-white-agent")
+
+STARTUP.mark_imported()
+
 class PlaywrightExecutor(AgentExecutor):    
+    def __init__(self):
+        self.running_tasks = TaskRegistry()
+
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        metadata = context.message.metadata if context.message else None
+        deadline = deadline_from(metadata)
+        task_prompt = context.get_user_input()
+        # Announcing the task first gives the caller its id, so it can send tasks/cancel.
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await updater.start_work(updater.new_agent_message([Part(TextPart(text=f"Task received: {task_prompt}. Launching Browser..."))]))
+        running = self.running_tasks.start(context.task_id, deadline)
+        try:
+            with tracing.span("white_agent.task", parent=tracing.extract(metadata)):
+                await self._run_task(context, event_queue, running)
+        finally:
+            self.running_tasks.finish(context.task_id)
+
+    async def _run_task(self, context: RequestContext, event_queue: EventQueue, running) -> None:
         task_prompt = context.get_user_input()
         print(f"\n🤖 White Agent: Received task -> '{task_prompt}'")
+        STARTUP.mark_task()
         print("🚀 Starting autonomous navigation...")
-        await event_queue.enqueue_event(new_agent_text_message(f"Task received: {task_prompt}. Launching Browser..."))
 
         action_log = []
         screenshots_b64 = []
+        stopped_reason = None
+        browser = None
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False, slow_mo=1000)
-            page = await browser.new_page()
+        from playwright.async_api import async_playwright
 
+        async with async_playwright() as p:
+            # Everything that can await is inside the try, so a deadline that fires early still
+            # sends back an evidence payload.
             try:
+                with tracing.span("browser_launch"):
+                    browser = await p.chromium.launch(headless=False, slow_mo=1000)
+                    page = await browser.new_page()
+
                 print("   Step 1: Navigating to Search Engine...")
-                await page.goto("https://duckduckgo.com")
+                with tracing.span("page_load", url="https://duckduckgo.com"):
+                    await page.goto("https://duckduckgo.com")
                 action_log.append("1. Navigated to https://duckduckgo.com")
                 
                 sc = await page.screenshot()
@@ -49,7 +85,8 @@ class PlaywrightExecutor(AgentExecutor):
                 await page.press("input[name='q']", "Enter")
                 action_log.append(f"2. Searched for: '{task_prompt}'")
                 
-                await page.wait_for_load_state("networkidle")
+                with tracing.span("wait"):
+                    await page.wait_for_load_state("networkidle")
                 
                 sc = await page.screenshot()
                 screenshots_b64.append(screenshot_to_base64(sc))
@@ -73,15 +110,24 @@ class PlaywrightExecutor(AgentExecutor):
                 sc = await page.screenshot()
                 screenshots_b64.append(screenshot_to_base64(sc))
                 
+            except asyncio.CancelledError:
+                stopped_reason = running.reason or "cancelled"
+                print(f"⏹️ Stopped early ({stopped_reason}).")
+                action_log.append(f"STOPPED EARLY: {stopped_reason}")
             except Exception as e:
                 print(f"❌ Critical Error during navigation: {e}")
                 action_log.append(f"CRITICAL ERROR: {str(e)}")
             finally:
-                await browser.close()
+                if browser is not None:
+                    await browser.close()
+
+        if stopped_reason == "cancelled":
+            raise asyncio.CancelledError()
 
         print("📦 Packaging evidence...")
         response_payload = {
             "final_answer": f"Executed search for {task_prompt}",
+            "stopped_reason": stopped_reason,
             "evidence_bundle": {
                 "screenshots": screenshots_b64,
                 "action_trace": "\n".join(action_log)
@@ -92,7 +138,9 @@ class PlaywrightExecutor(AgentExecutor):
         await event_queue.enqueue_event(new_agent_text_message(json.dumps(response_payload)))
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        pass
+        if self.running_tasks.cancel(context.task_id):
+            print(f"🛑 Cancelling task {context.task_id}")
+        await TaskUpdater(event_queue, context.task_id, context.context_id).cancel()
 
 
 card_data = {
@@ -101,7 +149,7 @@ card_data = {
     "version": "0.1.0",
     "defaultInputModes": ["text"],
     "defaultOutputModes": ["text"],
-    "capabilities": {"streaming": False},
+    "capabilities": {"streaming": True},
     "skills": [],
     "url": AGENT_URL
 }
@@ -114,7 +162,25 @@ a2a_app = A2AStarletteApplication(
     ),
 )
 
-app = a2a_app.build()
+def _preload():
+    from playwright.async_api import async_playwright  # noqa: F401
+
+async def _warm_up():
+    try:
+        if PREWARM:
+            await asyncio.to_thread(_preload)
+        STARTUP.mark_ready()
+    except Exception as e:
+        STARTUP.mark_ready(error=e)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so /health answers (live, not ready) while it runs.
+    warmup_task = asyncio.create_task(_warm_up())
+    yield
+    warmup_task.cancel()
+
+app = a2a_app.build(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -130,11 +196,17 @@ async def get_card(request):
 
 async def get_status(request):
     if request.method == "HEAD": return Response(media_type="application/json")
-    return JSONResponse({"status": "ok"})
+    return JSONResponse(STARTUP.health())
+
+async def get_ready(request):
+    status_code = 200 if STARTUP.ready else 503
+    if request.method == "HEAD": return Response(media_type="application/json", status_code=status_code)
+    return JSONResponse(STARTUP.health(), status_code=status_code)
 
 app.add_route("/", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/.well-known/agent-card.json", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/health", get_status, methods=["GET", "HEAD", "OPTIONS"])
+app.add_route("/ready", get_ready, methods=["GET", "HEAD"])
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
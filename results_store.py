@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from green_agentv2 import rubric_score
+
+RESULTS_PATH = os.environ.get("WEBJUDGE_RESULTS_PATH", "webjudge_results.db")
+
+RUBRIC_KEYS = ["goal_completion", "constraint_adherence", "efficiency", "evidence_quality"]
+
+# Columns added since the runs table was first created, applied to existing databases on open.
+MIGRATIONS = {
+    "grading_tier": "ALTER TABLE runs ADD COLUMN grading_tier TEXT",
+    "graded_image_bytes": "ALTER TABLE runs ADD COLUMN graded_image_bytes INTEGER",
+    "error": "ALTER TABLE runs ADD COLUMN error TEXT",
+}
+
+# `stats` holds running aggregates, updated in the same transaction as each run. Runs whose
+# grading failed (`error` set) are kept in `runs` but left out of the aggregates:
+#   (agent, '')   -> per white agent
+#   ('', task)    -> per task
+#   (agent, task) -> per agent and task, for regression comparisons
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    white_agent_url TEXT NOT NULL,
+    task_prompt TEXT NOT NULL,
+    final_verdict TEXT NOT NULL,
+    total_score REAL NOT NULL,
+    goal_completion REAL,
+    constraint_adherence REAL,
+    efficiency REAL,
+    evidence_quality REAL,
+    action_budget INTEGER,
+    actions_taken INTEGER,
+    screenshots INTEGER,
+    screenshot_bytes INTEGER,
+    response_bytes INTEGER,
+    action_trace_bytes INTEGER,
+    white_agent_seconds REAL,
+    grading_seconds REAL,
+    total_seconds REAL,
+    rubric_scores TEXT,
+    grading_tier TEXT,
+    graded_image_bytes INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_tier ON runs (grading_tier);
+CREATE INDEX IF NOT EXISTS runs_agent ON runs (white_agent_url, created_at);
+CREATE INDEX IF NOT EXISTS runs_task ON runs (task_prompt, created_at);
+CREATE TABLE IF NOT EXISTS stats (
+    white_agent_url TEXT NOT NULL,
+    task_prompt TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    total_seconds_sum REAL NOT NULL,
+    last_score REAL,
+    last_run_at REAL,
+    PRIMARY KEY (white_agent_url, task_prompt)
+);
+"""
+
+UPSERT_STATS = """
+INSERT INTO stats (white_agent_url, task_prompt, runs, successes, score_sum, total_seconds_sum, last_score, last_run_at)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (white_agent_url, task_prompt) DO UPDATE SET
+    runs = runs + 1,
+    successes = successes + excluded.successes,
+    score_sum = score_sum + excluded.score_sum,
+    total_seconds_sum = total_seconds_sum + excluded.total_seconds_sum,
+    last_score = excluded.last_score,
+    last_run_at = excluded.last_run_at
+"""
+
+STATS_COLUMNS = """
+    runs,
+    ROUND(1.0 * successes / runs, 3) AS success_rate,
+    ROUND(score_sum / runs, 2) AS avg_score,
+    ROUND(total_seconds_sum / runs, 2) AS avg_seconds,
+    last_score,
+    last_run_at
+"""
+
+
+def _score(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ResultsStore:
+    """
+    Local SQLite store of assessment verdicts with incrementally maintained aggregates,
+    so leaderboards and regression comparisons are single indexed queries.
+    """
+
+    def __init__(self, path: str = RESULTS_PATH):
+        self.path = path
+        with self._connect() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+            if columns:
+                for column, statement in MIGRATIONS.items():
+                    if column not in columns:
+                        conn.execute(statement)
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def record(self, result: dict) -> int:
+        """Stores one structured assessment result and, unless grading failed, folds it into the aggregates."""
+        now = time.time()
+        rubric = result.get("rubric_scores") or {}
+        evidence = result.get("evidence") or {}
+        timings = result.get("timings") or {}
+        agent = result["white_agent_url"]
+        task = result["task_prompt"]
+        score = _score(result.get("total_score"))
+        success = 1 if result.get("final_verdict") == "SUCCESS" else 0
+        seconds = _score(timings.get("total_seconds"))
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT INTO runs (created_at, white_agent_url, task_prompt, final_verdict, total_score,"
+                " goal_completion, constraint_adherence, efficiency, evidence_quality,"
+                " action_budget, actions_taken, screenshots, screenshot_bytes, response_bytes, action_trace_bytes,"
+                " white_agent_seconds, grading_seconds, total_seconds, rubric_scores, grading_tier, graded_image_bytes, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    now, agent, task, result.get("final_verdict", "UNKNOWN"), score,
+                    *[rubric_score(rubric[key]) if key in rubric else None for key in RUBRIC_KEYS],
+                    result.get("action_budget"), result.get("actions_taken"),
+                    evidence.get("screenshots"), evidence.get("screenshot_bytes"),
+                    evidence.get("response_bytes"), evidence.get("action_trace_bytes"),
+                    timings.get("white_agent_seconds"), timings.get("grading_seconds"), timings.get("total_seconds"),
+                    json.dumps(rubric), result.get("grading_tier"), evidence.get("graded_image_bytes"),
+                    result.get("error"),
+                ),
+            )
+            if not result.get("error"):
+                for key in [(agent, ""), ("", task), (agent, task)]:
+                    conn.execute(UPSERT_STATS, (*key, success, score, seconds, score, now))
+            conn.execute("COMMIT")
+        return cursor.lastrowid
+
+    def leaderboard(self, limit: int = 50) -> list:
+        """White agents ranked by success rate, then average score."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT white_agent_url, {STATS_COLUMNS} FROM stats WHERE task_prompt = ''"
+                " ORDER BY success_rate DESC, avg_score DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def task_summary(self, limit: int = 50) -> list:
+        """Tasks ordered from hardest (lowest success rate) to easiest."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT task_prompt, {STATS_COLUMNS} FROM stats WHERE white_agent_url = ''"
+                " ORDER BY success_rate ASC, avg_score ASC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def tier_summary(self) -> list:
+        """How many verdicts each grading tier decided, and what grading cost on average."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT COALESCE(grading_tier, 'vision') AS grading_tier, COUNT(*) AS runs,"
+                " ROUND(AVG(grading_seconds), 2) AS avg_grading_seconds"
+                " FROM runs GROUP BY 1 ORDER BY runs DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def compare(self, baseline_url: str, candidate_url: str) -> list:
+        """Per-task average scores of two white agents on the tasks both have run."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT b.task_prompt,"
+                " ROUND(b.score_sum / b.runs, 2) AS baseline_avg_score,"
+                " ROUND(c.score_sum / c.runs, 2) AS candidate_avg_score,"
+                " ROUND(c.score_sum / c.runs - b.score_sum / b.runs, 2) AS delta,"
+                " b.runs AS baseline_runs, c.runs AS candidate_runs"
+                " FROM stats b JOIN stats c ON c.task_prompt = b.task_prompt"
+                " WHERE b.white_agent_url = ? AND c.white_agent_url = ? AND b.task_prompt != ''"
+                " ORDER BY delta ASC",
+                (baseline_url, candidate_url),
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -1,23 +1,27 @@
+from startup import StartupState, PREWARM
+
+STARTUP = StartupState()
+
 import uvicorn
 import json
 import os
 import base64
 import asyncio
-import google.generativeai as genai
-from PIL import Image
 import io
-from playwright_stealth import Stealth
+from contextlib import asynccontextmanager
+
+import tracing
+from cancellation import TaskRegistry, deadline_from
 
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import InMemoryTaskStore, TaskUpdater
 from a2a.types import AgentCard
 from a2a.utils import new_agent_text_message
 
-from playwright.async_api import async_playwright
 from starlette.responses import JSONResponse, Response
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
@@ -25,77 +29,167 @@ from starlette.middleware.cors import CORSMiddleware
 
 AGENT_URL = "https://webjudge-white-agent.onrender.com"
 
-try:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-except KeyError:
-    pass
+# google.generativeai, PIL and Playwright are imported on first use (or by the lifespan
+# warm-up) so the server binds its port quickly after a spin-up.
+_model = None
 
-model = genai.GenerativeModel('gemini-flash-latest')
+def get_model():
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        try:
+            genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+        except KeyError:
+            pass
+        _model = genai.GenerativeModel('gemini-flash-latest')
+    return _model
 
 def screenshot_to_base64(screenshot_bytes):
     return base64.b64encode(screenshot_bytes).decode('utf-8')
 
 def bytes_to_image(screenshot_bytes):
+    from PIL import Image
     return Image.open(io.BytesIO(screenshot_bytes))
 
+
+class BrowserPool:
+    """One long-lived Chromium shared by all tasks; each task gets its own context."""
+
+    def __init__(self):
+        self._playwright_cm = None
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright
+                    from playwright_stealth import Stealth
+                    self._playwright_cm = Stealth().use_async(async_playwright())
+                    self._playwright = await self._playwright_cm.__aenter__()
+                print("   🌐 Launching browser...")
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    args=[
+                        "--disable-blink-features=AutomationControlled",
+                        "--no-sandbox",
+                        "--disable-dev-shm-usage"
+                    ]
+                )
+            return self._browser
+
+    async def new_context(self, **options):
+        """
+        Opens a context on the shared browser. If the caller is cancelled while the context is
+        being opened, it is closed once it exists instead of leaking on the shared browser.
+        """
+        browser = await self.get()
+        opening = asyncio.ensure_future(browser.new_context(**options))
+        try:
+            return await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            opening.add_done_callback(_close_orphaned_context)
+            raise
+
+    async def close(self):
+        async with self._lock:
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright_cm is not None:
+                await self._playwright_cm.__aexit__(None, None, None)
+                self._playwright_cm = None
+                self._playwright = None
+
+
+def _close_orphaned_context(opening: asyncio.Future) -> None:
+    if not opening.cancelled() and opening.exception() is None:
+        asyncio.ensure_future(opening.result().close())
+
+
+browser_pool = BrowserPool()
+
+tracing.set_service("smart-white-agent")
+
+STARTUP.mark_imported()
+
 class SmartPlaywrightExecutor(AgentExecutor):
+
+    def __init__(self):
+        self.running_tasks = TaskRegistry()
     
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        metadata = context.message.metadata if context.message else None
+        # The Green Agent's deadline (or cancel()) stops the task and returns the evidence gathered so far.
+        deadline = deadline_from(metadata)
+        # Announcing the task first gives the caller its id, so it can send tasks/cancel.
+        await TaskUpdater(event_queue, context.task_id, context.context_id).start_work()
+        running = self.running_tasks.start(context.task_id, deadline)
+        try:
+            with tracing.span("white_agent.task", parent=tracing.extract(metadata)):
+                await self._run_task(context, event_queue, running)
+        finally:
+            self.running_tasks.finish(context.task_id)
+
+    async def _run_task(self, context: RequestContext, event_queue: EventQueue, running) -> None:
         raw_task = context.get_user_input()
         print(f"\n🧠 Smart Agent: Received task -> '{raw_task}'")
-        
-        print("   ✨ Optimizing search query...")
-        search_query = raw_task
-        try:
-            opt_prompt = f"Convert this task into a short search engine query: '{raw_task}'. Output ONLY the query."
-            resp = model.generate_content(opt_prompt)
-            search_query = resp.text.strip().replace('"', '')
-            print(f"   🔍 Query: '{search_query}'")
-        except:
-            pass
+        STARTUP.mark_task()
+        model = get_model()
 
+        search_query = raw_task
         action_log = []
         screenshots_b64 = []
         MAX_STEPS = 10
         
         last_action_text = ""
         loop_count = 0
+        stopped_reason = None
+        browser_context = None
 
-        async with Stealth().use_async(async_playwright()) as p:
-            is_render = os.environ.get("RENDER") is not None
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage"
-                ]
-            )
-            context = await browser.new_context(
-                viewport={"width": 1280, "height": 800},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
-
-
+        # Everything that can await is inside the try, so a deadline that fires early still
+        # sends back an evidence payload.
+        try:
+            print("   ✨ Optimizing search query...")
             try:
-                encoded_query = search_query.replace(" ", "+")
-                start_url = f"https://duckduckgo.com/?q={encoded_query}&t=h_&ia=web"
-                print(f"   📍 Navigating directly to: {start_url}")
-                
+                opt_prompt = f"Convert this task into a short search engine query: '{raw_task}'. Output ONLY the query."
+                with tracing.span("query_rewrite"):
+                    resp = await model.generate_content_async(opt_prompt)
+                search_query = resp.text.strip().replace('"', '')
+                print(f"   🔍 Query: '{search_query}'")
+            except Exception:
+                pass
+
+            with tracing.span("browser_launch"):
+                browser_context = await browser_pool.new_context(
+                    viewport={"width": 1280, "height": 800},
+                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+                )
+
+            page = await browser_context.new_page()
+            encoded_query = search_query.replace(" ", "+")
+            start_url = f"https://duckduckgo.com/?q={encoded_query}&t=h_&ia=web"
+            print(f"   📍 Navigating directly to: {start_url}")
+            
+            with tracing.span("page_load", url=start_url):
                 await page.goto(start_url)
-                action_log.append(f"1. Direct navigation to search: {search_query}")
-                
+            action_log.append(f"1. Direct navigation to search: {search_query}")
+            
+            with tracing.span("wait"):
                 await page.wait_for_load_state("domcontentloaded")
                 await asyncio.sleep(3)
 
-                for step in range(MAX_STEPS):
+            for step in range(MAX_STEPS):
+                with tracing.span("step", step=step + 1):
                     print(f"\n--- Step {step + 1}/{MAX_STEPS} ---")
-                    
+                
                     try:
-                        screenshot_bytes = await page.screenshot(timeout=5000)
-                        img_pil = bytes_to_image(screenshot_bytes)
-                        screenshots_b64.append(screenshot_to_base64(screenshot_bytes))
+                        with tracing.span("capture"):
+                            screenshot_bytes = await page.screenshot(timeout=5000)
+                            img_pil = bytes_to_image(screenshot_bytes)
+                            screenshots_b64.append(screenshot_to_base64(screenshot_bytes))
                     except Exception as e:
                         print(f"Capture error: {e}")
                         break
@@ -103,31 +197,32 @@ class SmartPlaywrightExecutor(AgentExecutor):
                     prompt = f"""
                     You are a web agent. Goal: "{raw_task}".
                     Current Query Used: "{search_query}"
-                    
+                
                     Tools (JSON only):
                     1. {{ "action": "click", "text": "visible text" }}
                     2. {{ "action": "scroll" }}
                     3. {{ "action": "done" }} (If you see the product/answer)
-                    
+                
                     If you see a cookie banner, click 'Accept' or 'Reject'.
                     If you see a list of results, click the most relevant Link Title.
                     If you see an error or 'Try Again', try to click something else or say "done".
-                    
+                
                     Respond ONLY with JSON.
                     """
-                    
+                
                     try:
-                        response = model.generate_content([prompt, img_pil])
+                        with tracing.span("decide"):
+                            response = await model.generate_content_async([prompt, img_pil])
                         text_resp = response.text.replace("```json", "").replace("```", "").strip()
                         decision = json.loads(text_resp)
                         print(f"   🤖 Thought: {decision}")
-                    except:
+                    except Exception:
                         print("   ⚠️ Brain fail, defaulting to scroll")
                         decision = {"action": "scroll"}
 
                     action_type = decision.get("action")
                     target_text = decision.get("text", "")
-                    
+                
                     if action_type == "click" and target_text == last_action_text:
                         loop_count += 1
                     else:
@@ -146,9 +241,11 @@ class SmartPlaywrightExecutor(AgentExecutor):
                         try:
                             elem = page.get_by_text(target_text, exact=False).first
                             if await elem.is_visible():
-                                await elem.click(timeout=5000)
-                                await page.wait_for_load_state("domcontentloaded")
-                                await asyncio.sleep(2)
+                                with tracing.span("act", action="click"):
+                                    await elem.click(timeout=5000)
+                                with tracing.span("wait"):
+                                    await page.wait_for_load_state("domcontentloaded")
+                                    await asyncio.sleep(2)
                             else:
                                 print("   Element not visible")
                         except Exception as e:
@@ -156,38 +253,55 @@ class SmartPlaywrightExecutor(AgentExecutor):
 
                     elif action_type == "scroll":
                         print("   📜 Scrolling...")
-                        await page.mouse.wheel(0, 600)
-                        await asyncio.sleep(1)
+                        with tracing.span("act", action="scroll"):
+                            await page.mouse.wheel(0, 600)
+                        with tracing.span("wait"):
+                            await asyncio.sleep(1)
 
                     elif action_type == "done":
                         print("   🎉 Task Completed.")
                         break
-                    
+                
                     elif action_type == "type":
                          pass 
 
-            except Exception as e:
-                print(f"❌ Critical Error: {e}")
-                action_log.append(f"CRITICAL ERROR: {str(e)}")
+        except asyncio.CancelledError:
+            stopped_reason = running.reason or "cancelled"
+            print(f"⏹️ Stopped early ({stopped_reason}).")
+            action_log.append(f"STOPPED EARLY: {stopped_reason}")
+
+        except Exception as e:
+            print(f"❌ Critical Error: {e}")
+            action_log.append(f"CRITICAL ERROR: {str(e)}")
+        
+        finally:
+            print("📦 Closing browser context and packaging evidence...")
+            if browser_context is not None:
+                try:
+                    await browser_context.close()
+                except Exception as e:
+                    print(f"⚠️ Could not close browser context: {e}")
             
-            finally:
-                print("📦 Closing browser and packaging evidence...")
-                await browser.close()
-                
-                response_payload = {
-                    "final_answer": "Agent finished execution.",
-                    "evidence_bundle": {
-                        "screenshots": screenshots_b64,
-                        "action_trace": "\n".join(action_log)
-                    }
+            response_payload = {
+                "final_answer": "Agent finished execution." if stopped_reason is None else f"Agent stopped early ({stopped_reason}).",
+                "stopped_reason": stopped_reason,
+                "evidence_bundle": {
+                    "screenshots": screenshots_b64,
+                    "action_trace": "\n".join(action_log)
                 }
-                
-                json_response = json.dumps(response_payload)
-                print(f"📤 Sending Payload ({len(json_response)} bytes)")
-                await event_queue.enqueue_event(new_agent_text_message(json_response))
+            }
+            
+            json_response = json.dumps(response_payload)
+            print(f"📤 Sending Payload ({len(json_response)} bytes)")
+            await event_queue.enqueue_event(new_agent_text_message(json_response))
+
+        if stopped_reason == "cancelled":
+            raise asyncio.CancelledError()
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        pass
+        if self.running_tasks.cancel(context.task_id):
+            print(f"🛑 Cancelling task {context.task_id}")
+        await TaskUpdater(event_queue, context.task_id, context.context_id).cancel()
 
 card_data = {
     "name": "smart-white-agent",
@@ -195,11 +309,32 @@ card_data = {
     "version": "1.2.0",
     "defaultInputModes": ["text"],
     "defaultOutputModes": ["text"],
-    "capabilities": {"streaming": False},
+    "capabilities": {"streaming": True},
     "skills": [],
     "url": AGENT_URL
 }
 
+def _preload():
+    from PIL import Image  # noqa: F401
+    get_model().count_tokens("ping")
+
+async def _warm_up():
+    try:
+        if PREWARM:
+            await browser_pool.get()
+            await asyncio.to_thread(_preload)
+        STARTUP.mark_ready()
+    except Exception as e:
+        STARTUP.mark_ready(error=e)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so /health answers (live, not ready) while it runs.
+    warmup_task = asyncio.create_task(_warm_up())
+    yield
+    warmup_task.cancel()
+    await browser_pool.close()
+
 a2a_app = A2AStarletteApplication(
     agent_card=AgentCard(**card_data),
     http_handler=DefaultRequestHandler(
@@ -208,7 +343,7 @@ a2a_app = A2AStarletteApplication(
     ),
 )
 
-app = a2a_app.build()
+app = a2a_app.build(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -224,11 +359,17 @@ async def get_card(request):
 
 async def get_status(request):
     if request.method == "HEAD": return Response(media_type="application/json")
-    return JSONResponse({"status": "ok"})
+    return JSONResponse(STARTUP.health())
+
+async def get_ready(request):
+    status_code = 200 if STARTUP.ready else 503
+    if request.method == "HEAD": return Response(media_type="application/json", status_code=status_code)
+    return JSONResponse(STARTUP.health(), status_code=status_code)
 
 app.add_route("/", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/.well-known/agent-card.json", get_card, methods=["GET", "HEAD", "OPTIONS"])
 app.add_route("/health", get_status, methods=["GET", "HEAD", "OPTIONS"])
+app.add_route("/ready", get_ready, methods=["GET", "HEAD"])
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8001))
@@ -0,0 +1,53 @@
+import os
+import time
+
+# Import this module first in a server so the import timer covers the heavy imports after it.
+PROCESS_START = time.perf_counter()
+
+# Set WEBJUDGE_PREWARM=0 to skip warming the model client / browser in the lifespan hook.
+PREWARM = os.environ.get("WEBJUDGE_PREWARM", "1") != "0"
+
+
+class StartupState:
+    """Tracks liveness/readiness and how long each startup phase took."""
+
+    def __init__(self):
+        self.imports_done_at = None
+        self.ready_at = None
+        self.first_task_at = None
+        self.warmup_error = None
+
+    def _since_start(self, t):
+        return round(t - PROCESS_START, 3) if t is not None else None
+
+    def mark_imported(self):
+        self.imports_done_at = time.perf_counter()
+        print(f"⏱️ Imports done in {self._since_start(self.imports_done_at)}s")
+
+    def mark_ready(self, error: Exception | None = None):
+        self.ready_at = time.perf_counter()
+        self.warmup_error = str(error) if error else None
+        print(f"⏱️ Ready after {self._since_start(self.ready_at)}s" + (f" (warm-up failed: {error})" if error else ""))
+
+    def mark_task(self):
+        if self.first_task_at is None:
+            self.first_task_at = time.perf_counter()
+            print(f"⏱️ First task after {self._since_start(self.first_task_at)}s")
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def health(self, **extra) -> dict:
+        return {
+            "status": "ok",
+            "live": True,
+            "ready": self.ready,
+            "startup": {
+                "import_seconds": self._since_start(self.imports_done_at),
+                "ready_seconds": self._since_start(self.ready_at),
+                "first_task_seconds": self._since_start(self.first_task_at),
+                "warmup_error": self.warmup_error,
+            },
+            **extra,
+        }
@@ -0,0 +1,162 @@
+import pytest
+
+import green_agentv2
+from green_agentv2 import apply_budget_score, rubric_score
+
+
+@pytest.mark.parametrize("item, expected", [
+    (40, 40.0),
+    ("35", 35.0),
+    ({"score": 10, "reasoning": "..."}, 10.0),
+    ({"score": "n/a"}, 0.0),
+    ({"reasoning": "no score"}, 0.0),
+    (None, 0.0),
+])
+def test_rubric_score(item, expected):
+    assert rubric_score(item) == expected
+
+
+@pytest.mark.parametrize("rubric", [
+    {"goal_completion": 40, "constraint_adherence": 40, "efficiency": 10, "evidence_quality": 10},
+    {
+        "goal_completion": {"score": 40, "reasoning": "..."},
+        "constraint_adherence": {"score": 40, "reasoning": "..."},
+        "efficiency": {"score": 10, "reasoning": "..."},
+        "evidence_quality": {"score": 10, "reasoning": "..."},
+    },
+])
+def test_budget_overrun_recomputes_total_and_verdict(rubric):
+    evaluation = {"rubric_scores": rubric, "total_score": 100, "final_verdict": "SUCCESS"}
+
+    evaluation = apply_budget_score(evaluation, actions_taken=20, action_budget=10)
+
+    assert evaluation["rubric_scores"]["efficiency"]["score"] == 0
+    assert evaluation["rubric_scores"]["goal_completion"]["score"] == 40
+    assert evaluation["total_score"] == 90
+    assert evaluation["final_verdict"] == "SUCCESS"
+
+
+def test_unreadable_scores_count_as_zero_and_downgrade_the_verdict():
+    evaluation = {
+        "rubric_scores": {"goal_completion": {"score": "n/a"}, "constraint_adherence": 40, "evidence_quality": 10},
+        "total_score": 100,
+        "final_verdict": "SUCCESS",
+    }
+
+    evaluation = apply_budget_score(evaluation, actions_taken=5, action_budget=10)
+
+    assert evaluation["total_score"] == 60
+    assert evaluation["final_verdict"] == "FAILURE"
+
+
+def test_evaluation_without_rubric_is_left_alone():
+    evaluation = {"final_verdict": "FAILURE", "summary_reasoning": "Error during evaluation."}
+
+    assert apply_budget_score(dict(evaluation), 5, 10) == evaluation
+
+
+def vision_result(**overrides):
+    result = {
+        "rubric_scores": {
+            "goal_completion": {"score": 40},
+            "constraint_adherence": {"score": 40},
+            "efficiency": {"score": 10},
+            "evidence_quality": {"score": 10},
+        },
+        "total_score": 100,
+        "final_verdict": "SUCCESS",
+    }
+    result.update(overrides)
+    return result
+
+
+@pytest.fixture
+def graders(monkeypatch):
+    """Stubs the two Gemini tiers and records which of them ran."""
+    calls = []
+    text = {}
+
+    def fake_text(*args):
+        calls.append("text")
+        return dict(text)
+
+    def fake_vision(*args):
+        calls.append("vision")
+        return vision_result()
+
+    monkeypatch.setattr(green_agentv2, "grade_text_only", fake_text)
+    monkeypatch.setattr(green_agentv2, "grade_agent_performance", fake_vision)
+    return calls, text
+
+
+def test_rules_fail_a_run_without_screenshots(graders):
+    calls, _ = graders
+
+    evaluation = green_agentv2.grade_agent_cascaded([], [], "1. Searched", 1, 10)
+
+    assert evaluation["grading_tier"] == "rules"
+    assert evaluation["final_verdict"] == "FAILURE"
+    assert calls == []
+
+
+def test_rules_fail_a_crash_before_any_result_page(graders):
+    calls, _ = graders
+
+    evaluation = green_agentv2.grade_agent_cascaded([], ["shot.png"], "CRITICAL ERROR: boom", 1, 10)
+
+    assert evaluation["grading_tier"] == "rules"
+    assert evaluation["final_verdict"] == "FAILURE"
+    assert evaluation["total_score"] == 10
+    assert calls == []
+
+
+def test_confident_text_success_still_goes_to_vision(graders):
+    calls, text = graders
+    text.update(vision_result(confidence=0.99))
+
+    evaluation = green_agentv2.grade_agent_cascaded([], ["shot.png"], "Step 1: done", 1, 10)
+
+    assert calls == ["text", "vision"]
+    assert evaluation["grading_tier"] == "vision"
+    assert evaluation["text_confidence"] == 0.99
+
+
+def test_unsure_text_failure_goes_to_vision(graders):
+    calls, text = graders
+    text.update(vision_result(final_verdict="FAILURE", confidence=0.5))
+
+    evaluation = green_agentv2.grade_agent_cascaded([], ["shot.png"], "Step 1: done", 1, 10)
+
+    assert calls == ["text", "vision"]
+    assert evaluation["grading_tier"] == "vision"
+
+
+def test_confident_text_failure_drops_evidence_quality(graders):
+    calls, text = graders
+    text.update(
+        rubric_scores={"goal_completion": 0, "constraint_adherence": {"score": 20}, "efficiency": 10, "evidence_quality": 10},
+        total_score=40,
+        final_verdict="FAILURE",
+        confidence=0.95,
+    )
+
+    evaluation = green_agentv2.grade_agent_cascaded([], ["shot.png"], "Step 1\nStep 2", 2, 1)
+
+    assert calls == ["text"]
+    assert evaluation["grading_tier"] == "text"
+    assert "evidence_quality" not in evaluation["rubric_scores"]
+    assert evaluation["rubric_scores"]["efficiency"]["score"] == 0
+    assert evaluation["total_score"] == 20
+    assert evaluation["final_verdict"] == "FAILURE"
+
+
+def test_vision_grader_error_is_labelled_as_such(graders, monkeypatch):
+    calls, text = graders
+    text.update(vision_result(confidence=0.99))
+    error = {"final_verdict": "FAILURE", "summary_reasoning": "Error during evaluation.", "error": "boom"}
+    monkeypatch.setattr(green_agentv2, "grade_agent_performance", lambda *args: dict(error))
+
+    evaluation = green_agentv2.grade_agent_cascaded([], ["shot.png"], "Step 1: done", 1, 10)
+
+    assert evaluation["grading_tier"] == "error"
+    assert evaluation["error"] == "boom"
@@ -0,0 +1,152 @@
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    monkeypatch.setattr(job_queue, "LEASE_SECONDS", 60)
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF", 5)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_leases_oldest_job(queue, clock):
+    first = queue.enqueue({"n": 1})
+    clock.now += 1
+    queue.enqueue({"n": 2})
+
+    job = queue.claim("w1")
+    assert job["id"] == first
+    assert job["status"] == "running"
+    assert job["worker"] == "w1"
+    assert job["attempts"] == 1
+    assert job["lease_expires_at"] == clock.now + 60
+    assert queue.claim("w2")["payload"] == {"n": 2}
+    assert queue.claim("w3") is None
+
+
+def test_complete_stores_result(queue):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+
+    assert queue.complete(job_id, "w1", {"final_verdict": "SUCCESS"})
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"final_verdict": "SUCCESS"}
+    assert job["lease_expires_at"] is None
+
+
+def test_fail_requeues_with_backoff_until_attempts_run_out(queue, clock):
+    job_id = queue.enqueue({}, max_attempts=2)
+
+    queue.claim("w1")
+    assert queue.fail(job_id, "w1", "boom") == "queued"
+    assert queue.get(job_id)["available_at"] == clock.now + 5
+    assert queue.claim("w1") is None
+
+    clock.now += 5
+    assert queue.claim("w1")["attempts"] == 2
+    assert queue.fail(job_id, "w1", "boom again") == "failed"
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "boom again"
+    clock.now += 100
+    assert queue.claim("w1") is None
+
+
+def test_fail_without_retry_is_final(queue):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+
+    assert queue.fail(job_id, "w1", "deadline passed", retry=False) == "failed"
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+    clock.now += 30
+    assert queue.claim("w2") is None
+
+    clock.now += 31
+    job = queue.claim("w2")
+    assert job["id"] == job_id
+    assert job["worker"] == "w2"
+    assert job["attempts"] == 2
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(queue, clock):
+    job_id = queue.enqueue({}, max_attempts=1)
+    queue.claim("w1")
+    clock.now += 61
+
+    assert queue.claim("w2") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "lease expired"
+
+
+def test_extend_lease_keeps_job_from_being_reclaimed(queue, clock):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+    clock.now += 50
+
+    assert queue.extend_lease(job_id, "w1")
+    clock.now += 50
+    assert queue.claim("w2") is None
+    assert queue.get(job_id)["worker"] == "w1"
+
+
+def test_stale_worker_cannot_finish_a_reclaimed_job(queue, clock):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+    clock.now += 61
+    queue.claim("w2")
+
+    assert queue.complete(job_id, "w2", {"final_verdict": "SUCCESS"})
+    assert queue.fail(job_id, "w1", "timed out") == "lost"
+    assert not queue.complete(job_id, "w1", {"final_verdict": "FAILURE"})
+    assert not queue.extend_lease(job_id, "w1")
+
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"final_verdict": "SUCCESS"}
+
+
+def test_stale_worker_cannot_requeue_a_running_job(queue, clock):
+    job_id = queue.enqueue({})
+    queue.claim("w1")
+    clock.now += 61
+    queue.claim("w2")
+
+    assert queue.fail(job_id, "w1", "timed out") == "lost"
+    job = queue.get(job_id)
+    assert job["status"] == "running"
+    assert job["worker"] == "w2"
+
+
+def test_cancel_only_drops_unclaimed_jobs(queue, clock):
+    claimed = queue.enqueue({})
+    clock.now += 1
+    waiting = queue.enqueue({})
+    queue.claim("w1")
+
+    assert queue.cancel(waiting)
+    assert queue.get(waiting)["status"] == "cancelled"
+    assert not queue.cancel(claimed)
+    assert queue.counts() == {"running": 1, "cancelled": 1}
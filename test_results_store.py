@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from results_store import ResultsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(str(tmp_path / "results.db"))
+
+
+def run(**overrides):
+    result = {
+        "white_agent_url": "http://white",
+        "task_prompt": "Find a PS5",
+        "final_verdict": "SUCCESS",
+        "total_score": 90,
+        "rubric_scores": {},
+        "timings": {"total_seconds": 10},
+    }
+    result.update(overrides)
+    return result
+
+
+def test_record_accepts_bare_and_nested_rubric_scores(store):
+    store.record(run(rubric_scores={
+        "goal_completion": 40,
+        "constraint_adherence": {"score": "35", "reasoning": "..."},
+        "efficiency": {"reasoning": "no score"},
+    }))
+
+    with sqlite3.connect(store.path) as conn:
+        row = conn.execute(
+            "SELECT goal_completion, constraint_adherence, efficiency, evidence_quality FROM runs"
+        ).fetchone()
+    assert row == (40.0, 35.0, 0.0, None)
+
+
+def test_aggregates_per_agent_and_task(store):
+    store.record(run(total_score=90))
+    store.record(run(final_verdict="FAILURE", total_score=50, timings={"total_seconds": 30}))
+    store.record(run(white_agent_url="http://other", total_score=70))
+
+    leaderboard = store.leaderboard()
+    assert [row["white_agent_url"] for row in leaderboard] == ["http://other", "http://white"]
+    white = leaderboard[1]
+    assert white["runs"] == 2
+    assert white["success_rate"] == 0.5
+    assert white["avg_score"] == 70
+    assert white["avg_seconds"] == 20
+
+    assert store.task_summary()[0]["runs"] == 3
+    assert store.compare("http://white", "http://other")[0]["delta"] == 0
+
+
+def test_grader_errors_are_kept_out_of_the_aggregates(store):
+    store.record(run(total_score=90))
+    store.record(run(
+        final_verdict="FAILURE", total_score=None, grading_tier="error", error="Gemini returned no JSON",
+    ))
+
+    white = store.leaderboard()[0]
+    assert white["runs"] == 1
+    assert white["success_rate"] == 1.0
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM runs WHERE error IS NOT NULL").fetchone() == (1,)
@@ -0,0 +1,202 @@
+import atexit
+import contextvars
+import glob
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Spans are written in the Chrome Trace Event format (one event per line), which
+# chrome://tracing and https://ui.perfetto.dev open as a latency waterfall. Each process writes
+# its own file, WEBJUDGE_TRACE_FILE with the pid added (traces.json -> traces.<pid>.json), so
+# worker processes never share one; merge_traces() combines them.
+# Trace context crosses agents as a W3C `traceparent` in the A2A message metadata.
+TRACE_FILE = os.environ.get("WEBJUDGE_TRACE_FILE")
+TRACEPARENT_KEY = "traceparent"
+
+_current_span = contextvars.ContextVar("webjudge_span", default=None)
+_service_name = os.path.basename(sys.argv[0]) or "python"
+# Per-process export state, reset in a forked child: (pid, pending lines queue, writer thread).
+_exporter = None
+# Spans end on the event loop and on grading threads alike; only one of them may start the writer.
+_exporter_lock = threading.Lock()
+
+
+def set_service(name: str) -> None:
+    """Names this process in the exported trace (e.g. 'green-agent')."""
+    global _service_name
+    _service_name = name
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attrs = attrs
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+def _parse_traceparent(header: str | None):
+    try:
+        version, trace_id, parent_id, _flags = header.split("-")
+        if len(trace_id) == 32 and len(parent_id) == 16:
+            return trace_id, parent_id
+    except (AttributeError, ValueError):
+        pass
+    return None
+
+
+@contextmanager
+def span(name: str, parent: str | None = None, **attrs):
+    """
+    Times a block as a span under the current one. `parent` is a traceparent header to
+    continue a trace started in another process (a remote A2A request or a queued job).
+    """
+    remote = _parse_traceparent(parent)
+    current = _current_span.get()
+    if remote:
+        trace_id, parent_id = remote
+    elif current:
+        trace_id, parent_id = current.trace_id, current.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    s = Span(name, trace_id, parent_id, attrs)
+    token = _current_span.set(s)
+    start = time.time()
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _export(s, start, time.time())
+
+
+def current_traceparent() -> str | None:
+    current = _current_span.get()
+    return current.traceparent if current else None
+
+
+def inject(metadata: dict | None = None) -> dict:
+    """Returns `metadata` with the current trace context added, for an outgoing A2A message."""
+    metadata = dict(metadata or {})
+    header = current_traceparent()
+    if header:
+        metadata[TRACEPARENT_KEY] = header
+    return metadata
+
+
+def extract(metadata: dict | None) -> str | None:
+    """Reads the traceparent from an incoming A2A message's metadata."""
+    return (metadata or {}).get(TRACEPARENT_KEY)
+
+
+def trace_path(pid: int | None = None) -> str:
+    """This process's trace file: WEBJUDGE_TRACE_FILE with the pid before the extension."""
+    root, ext = os.path.splitext(TRACE_FILE)
+    return f"{root}.{pid or os.getpid()}{ext or '.json'}"
+
+
+def _write_forever(path: str, pending: queue.SimpleQueue) -> None:
+    """Writer thread: the only code that touches this process's trace file."""
+    try:
+        f = open(path, "a", encoding="utf-8")
+    except OSError as e:
+        print(f"⚠️ Could not write trace: {e}")
+        return
+    with f:
+        if f.tell() == 0:
+            f.write("[\n")
+        while True:
+            lines = pending.get()
+            # Write out whatever else is already queued, so a burst of spans costs one flush.
+            while lines is not None and not pending.empty():
+                f.write(lines)
+                lines = pending.get()
+            if lines is None:
+                return
+            f.write(lines)
+            f.flush()
+
+
+def _pending_lines() -> queue.SimpleQueue:
+    global _exporter
+    pid = os.getpid()
+    with _exporter_lock:
+        if _exporter is None or _exporter[0] != pid:
+            pending = queue.SimpleQueue()
+            pending.put(json.dumps({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": _service_name}}) + ",\n")
+            writer = threading.Thread(target=_write_forever, args=(trace_path(pid), pending), name="trace-writer", daemon=True)
+            writer.start()
+            _exporter = (pid, pending, writer)
+        return _exporter[1]
+
+
+def _reset_exporter_lock():
+    # A fork can happen while another thread holds the lock; the child gets a fresh one.
+    global _exporter_lock
+    _exporter_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_exporter_lock)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _exporter is not None and _exporter[0] == os.getpid():
+        _exporter[1].put(None)
+        _exporter[2].join(timeout=2)
+
+
+def _export(s: Span, start: float, end: float) -> None:
+    """Queues the span for the writer thread, so the event loop never waits on file I/O."""
+    if not TRACE_FILE:
+        return
+    event = {
+        "name": s.name,
+        "cat": _service_name,
+        "ph": "X",
+        "ts": int(start * 1_000_000),
+        "dur": int((end - start) * 1_000_000),
+        "pid": os.getpid(),
+        # One row per trace, so concurrent assessments don't overlap in the waterfall.
+        "tid": int(s.trace_id[:8], 16),
+        "args": {"trace_id": s.trace_id, "span_id": s.span_id, "parent_id": s.parent_id, **s.attrs},
+    }
+    _pending_lines().put(json.dumps(event, default=str) + ",\n")
+
+
+def merge_traces(paths: list, output: str) -> None:
+    """
+    Merges trace files (e.g. every traces.<pid>.json written by the agents and workers) into
+    one JSON array. Paths may be glob patterns, for shells that don't expand them.
+    """
+    events = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip().rstrip(",")
+                    if line and line not in ("[", "]"):
+                        events.append(json.loads(line))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(events, f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python tracing.py <output.json> <trace_file> [<trace_file> ...]")
+        sys.exit(1)
+    merge_traces(sys.argv[2:], sys.argv[1])
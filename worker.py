@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+from job_queue import JobQueue, LEASE_SECONDS
+from assessment import run_assessment
+from green_agentv2 import warm_up, require_api_key
+from startup import PREWARM
+import tracing
+
+POLL_INTERVAL = float(os.environ.get("WEBJUDGE_WORKER_POLL", 1.0))
+WORKER_COUNT = int(os.environ.get("WEBJUDGE_WORKERS", 1))
+# A running job's lease is renewed this often, so only a worker that died loses it.
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+
+
+async def keep_lease(queue: JobQueue, job_id: str, worker_id: str, run: asyncio.Task, lost: asyncio.Event) -> None:
+    """Renews the lease while `run` works on the job; cancels `run` if another worker took the job over."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            renewed = await asyncio.to_thread(queue.extend_lease, job_id, worker_id)
+        except sqlite3.Error as e:
+            print(f"⚠️ Job {job_id}: could not renew the lease ({e}), retrying.")
+            continue
+        if not renewed:
+            print(f"⚠️ Job {job_id}: lease lost to another worker, abandoning it.")
+            lost.set()
+            run.cancel()
+            return
+
+
+async def work_forever(worker_id: str) -> None:
+    queue = JobQueue()
+    if PREWARM:
+        try:
+            await asyncio.to_thread(warm_up)
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id}: warm-up failed: {e}")
+    print(f"👷 Worker {worker_id}: polling {queue.path}")
+
+    while True:
+        job = await asyncio.to_thread(queue.claim, worker_id)
+        if job is None:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+
+        payload = job["payload"]
+        print(f"📥 Job {job['id']} (attempt {job['attempts']}/{job['max_attempts']}): {payload['task_prompt']}")
+        deadline = payload.get("deadline")
+        if deadline is not None and time.time() >= deadline:
+            await asyncio.to_thread(
+                queue.fail, job["id"], worker_id, "Deadline passed before a worker picked the job up.", retry=False
+            )
+            print(f"⏰ Job {job['id']} skipped: deadline passed.")
+            continue
+
+        run = asyncio.create_task(run_assessment(
+            payload["white_agent_url"], payload["task_prompt"], payload["action_budget"],
+            traceparent=payload.get("traceparent"), deadline=deadline,
+        ))
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(keep_lease(queue, job["id"], worker_id, run, lost))
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            if not lost.is_set():
+                raise
+            continue
+        except Exception as e:
+            status = await asyncio.to_thread(queue.fail, job["id"], worker_id, str(e))
+            print(f"❌ Job {job['id']} failed ({status}): {e}")
+        else:
+            if await asyncio.to_thread(queue.complete, job["id"], worker_id, result):
+                print(f"✅ Job {job['id']} done.")
+            else:
+                print(f"⚠️ Job {job['id']}: finished after losing the lease; result discarded.")
+        finally:
+            heartbeat.cancel()
+            run.cancel()
+
+
+def run_worker() -> None:
+    tracing.set_service("green-worker")
+    require_api_key()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    asyncio.run(work_forever(worker_id))
+
+
+if __name__ == "__main__":
+    if WORKER_COUNT <= 1:
+        run_worker()
+    else:
+        processes = [multiprocessing.Process(target=run_worker) for _ in range(WORKER_COUNT)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()